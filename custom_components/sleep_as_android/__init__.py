@@ -2,13 +2,12 @@
 from __future__ import annotations
 
 import asyncio
-from functools import cache, cached_property
 import logging
 import re
 from typing import Callable, List, Tuple
 
-from awesomeversion import AwesomeVersion
 from homeassistant.components.mqtt import subscription
+from homeassistant.components.mqtt.models import ReceiveMessage
 from homeassistant.components.mqtt.subscription import EntitySubscription
 from homeassistant import loader
 from homeassistant.config_entries import ConfigEntry
@@ -17,13 +16,25 @@ from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import NoEntitySpecifiedError
 from homeassistant.helpers import device_registry, entity_platform
 from homeassistant.helpers.device_registry import DeviceEntry
+from homeassistant.helpers.event import async_call_later
 from pyhaversion import HaVersion
 
 from .const import DEVICE_MACRO, DOMAIN
-from .sensor import SleepAsAndroidSensor, SleepAsAndroidLastEvent, SleepAsAndroidIsAsleep
+from .sensor import (
+    SleepAsAndroidIsAsleep,
+    SleepAsAndroidLastEvent,
+    SleepAsAndroidSensor,
+    decode_message,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
+_VERSION_RE = re.compile(r"(\d+)\.(\d+)\.(\d+)")
+# Home Assistant version with changed MQTT subscription API
+_MQTT_API_2022_03 = (2022, 3, 0)
+# Seconds to collect sensors of new devices before adding them in one batch
+_NEW_DEVICES_DELAY = 0.05
+
 
 async def async_setup(_hass: HomeAssistant, _config_entry: ConfigEntry):
     """Set up the integration based on configuration.yaml."""
@@ -71,7 +82,9 @@ async def async_remove_config_entry_device(
 ) -> bool:
     """Remove a config entry from a device."""
     _LOGGER.debug(
-        f"Removing device {device_entry.name} ({device_entry.id=}) by user request"
+        "Removing device %s (device_entry.id=%s) by user request",
+        device_entry.name,
+        device_entry.id,
     )
     device_registry.async_get(hass).async_remove_device(device_id=device_entry.id)
     instance: SleepAsAndroidInstance = hass.data[DOMAIN][config_entry.entry_id]
@@ -88,24 +101,70 @@ class SleepAsAndroidInstance:
         self.hass = hass
         self._config_entry = config_entry
         self._subscription_state = None
-        self._ha_version: AwesomeVersion | None = None
-        self.__sensors: dict[str, List[SleepAsAndroidSensor]] = {}
+        self._ha_version: Tuple[int, ...] | None = None
+        self._use_new_api: bool | None = None
+        self.__sensors: dict[str, Tuple[SleepAsAndroidSensor, ...]] = {}
+        self._platform: entity_platform.EntityPlatform | None = None
+        # Sensors of new devices waiting to be added to Home Assistant
+        self._new_devices: dict[str, Tuple[SleepAsAndroidSensor, ...]] = {}
+        # Messages received while new sensors are being added. None if nothing is pending
+        self._pending_messages: List[
+            Tuple[str, Tuple[SleepAsAndroidSensor, ...], ReceiveMessage]
+        ] | None = None
+        self._cancel_add_new_sensors: Callable[[], None] | None = None
 
         try:
-            self._name: str = self.get_from_config("name")
+            self._name: str = self._get_from_config("name")
         except KeyError:
             self._name = "SleepAsAndroid"
 
-        # ToDo prepare topic_template and other variables that should be defined one time.
+        try:
+            self._configured_topic: str = self._get_from_config("topic_template")
+        except KeyError:
+            self._configured_topic = "SleepAsAndroid/" + DEVICE_MACRO
+            _LOGGER.warning(
+                "Could not find topic_template in configuration. Will use %s instead",
+                self._configured_topic,
+            )
+
+        # DEVICE_MACRO should be a whole topic level, so look for it between slashes
+        macro_index = f"/{self._configured_topic}/".find(f"/{DEVICE_MACRO}/")
+        if macro_index < 0:
+            # Device name is the last topic level, so position is after the last one
+            self._device_position_in_topic: int = (
+                self._configured_topic.count("/") + 1
+            )
+            self._topic_template: str = self._configured_topic
+            # Length of the topic part before DEVICE_MACRO, so device name could be
+            # extracted from incoming topics by slicing. None if the part could
+            # differ in incoming topics.
+            self._device_prefix_len: int | None = None
+        else:
+            self._device_position_in_topic = self._configured_topic.count(
+                "/", 0, macro_index
+            )
+            self._topic_template = (
+                self._configured_topic[:macro_index]
+                + "+"
+                + self._configured_topic[macro_index + len(DEVICE_MACRO) :]
+            )
+            # a wildcard before DEVICE_MACRO matches levels of any length
+            if "+" not in self._configured_topic[:macro_index]:
+                self._device_prefix_len = macro_index
+            else:
+                self._device_prefix_len = None
 
     async def unsubscribe(self):
         """Unsubscribe from topics."""
-        _LOGGER.debug(f"subscription state is {self._subscription_state}")
+        _LOGGER.debug("subscription state is %s", self._subscription_state)
+        if self._cancel_add_new_sensors is not None:
+            self._cancel_add_new_sensors()
+            self._cancel_add_new_sensors = None
         if self._subscription_state is not None:
             _LOGGER.debug("Unsubscribing")
-            if self._ha_version is None:
+            if self._use_new_api is None:
                 await self._get_version()
-            if self._ha_version >= AwesomeVersion("2022.3.0"):
+            if self._use_new_api:
                 self._subscription_state = subscription.async_unsubscribe_topics(
                     hass=self.hass,
                     sub_state=self._subscription_state,
@@ -116,18 +175,10 @@ class SleepAsAndroidInstance:
                     sub_state=self._subscription_state,
                 )
 
-    @cached_property
+    @property
     def device_position_in_topic(self) -> int:
         """Position of DEVICE_MACRO in configured MQTT topic."""
-        result: int = 0
-
-        for p in self.configured_topic.split("/"):
-            if p == DEVICE_MACRO:
-                break
-            else:
-                result += 1
-
-        return result
+        return self._device_position_in_topic
 
     @staticmethod
     def device_name_from_topic_and_position(topic: str, position: int) -> str:
@@ -137,7 +188,8 @@ class SleepAsAndroidInstance:
         :param position: position of device template
         :returns: device name
         """
-        s = topic.split("/")
+        # levels after device name are not needed
+        s = topic.split("/", position + 1)
         if position >= len(s):
             # If we have no DEVICE_MACRO in configured_topic,
             # then device_position_in_topic is greater than topic length and we should use
@@ -146,31 +198,28 @@ class SleepAsAndroidInstance:
 
         return s[position]
 
-    @cache
     def device_name_from_topic(self, topic: str) -> str:
         """Get device name from topic.
 
         :param topic: topic string from MQTT message
         :returns: device name
         """
-        return self.device_name_from_topic_and_position(
-            topic, self.device_position_in_topic
-        )
+        if self._device_prefix_len is None:
+            # No DEVICE_MACRO or wildcards before it in configured_topic
+            return self.device_name_from_topic_and_position(
+                topic, self._device_position_in_topic
+            )
+
+        device = topic[self._device_prefix_len :]
+        end = device.find("/")
+        return device if end < 0 else device[:end]
 
-    @cached_property
+    @property
     def topic_template(self) -> str:
-        """Convert topic with {device} to MQTT topic for subscribing."""
-        splitted_topic = self.configured_topic.split("/")
-        try:
-            splitted_topic[self.device_position_in_topic] = "+"
-        except IndexError:
-            # If we have no DEVICE_MACRO in configured_topic,
-            # then device_position_in_topic is greater than topic length
-            pass
-        return "/".join(splitted_topic)
+        """MQTT topic for subscribing: configured topic with {device} replaced by '+'."""
+        return self._topic_template
 
-    @cache
-    def get_from_config(self, name: str) -> str:
+    def _get_from_config(self, name: str) -> str:
         """Get current configuration."""
         try:
             data = self._config_entry.options[name]
@@ -184,21 +233,10 @@ class SleepAsAndroidInstance:
         """Name of the integration in Home Assistant."""
         return self._name
 
-    @cached_property
+    @property
     def configured_topic(self) -> str:
         """MQTT topic from integration configuration."""
-        _topic = None
-
-        try:
-            _topic = self.get_from_config("topic_template")
-        except KeyError:
-            _topic = "SleepAsAndroid/" + DEVICE_MACRO
-            _LOGGER.warning(
-                "Could not find topic_template in configuration. Will use %s instead",
-                _topic,
-            )
-
-        return _topic
+        return self._configured_topic
 
 
     async def subscribe_root_topic(self, platform):
@@ -209,20 +247,7 @@ class SleepAsAndroidInstance:
             self.configured_topic,
         )
         self._subscription_state = None
-
-        @callback
-        def message_received(msg):
-            """Handle new MQTT messages."""
-
-            _LOGGER.debug("Got message %s", msg)
-            device_name = self.device_name_from_topic(msg.topic)
-            sensors, is_new = self.get_sensors(device_name)
-            async def routine():
-                if is_new:
-                    await platform.async_add_entities(sensors, True)
-                for sensor in sensors:
-                    sensor.process_message(msg)
-            self.hass.async_create_task(routine())
+        self._platform = platform
 
         async def subscribe_2022_03(
             _hass: HomeAssistant, _state, _topic: dict
@@ -250,14 +275,16 @@ class SleepAsAndroidInstance:
         topic = {
             "state_topic": {
                 "topic": self.topic_template,
-                "msg_callback": message_received,
+                "msg_callback": self.message_received,
                 "qos": self._config_entry.data["qos"],
+                # orjson decodes bytes itself, so skip decoding payload to str
+                "encoding": None,
             }
         }
 
-        if self._ha_version is None:
+        if self._use_new_api is None:
             await self._get_version()
-        if self._ha_version >= AwesomeVersion("2022.3.0"):
+        if self._use_new_api:
             self._subscription_state = await subscribe_2022_03(
                 self.hass,
                 self._subscription_state,
@@ -273,26 +300,98 @@ class SleepAsAndroidInstance:
         if self._subscription_state is not None:
             _LOGGER.debug("Subscribing to root topic is done!")
         else:
-            _LOGGER.critical(f"Could not subscribe to topic {self.topic_template}")
+            _LOGGER.critical("Could not subscribe to topic %s", self.topic_template)
 
 
-    def get_sensors(self, device) -> Tuple[List[SleepAsAndroidSensor], bool]:
+    @staticmethod
+    def _process_message(
+        sensors: Tuple[SleepAsAndroidSensor, ...], msg: ReceiveMessage
+    ) -> None:
+        """Decode message once and pass it to all sensors of the device."""
+        if (decoded := decode_message(msg)) is not None:
+            for sensor in sensors:
+                sensor.process_message(*decoded)
+
+    @callback
+    def message_received(self, msg: ReceiveMessage) -> None:
+        """Handle new MQTT messages."""
+
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Got message %s", msg)
+        device_name = self.device_name_from_topic(msg.topic)
+        sensors, is_new = self.get_sensors(device_name)
+        if not is_new and self._pending_messages is None:
+            # callback is running in the event loop, so existing sensors
+            # could process message right away
+            self._process_message(sensors, msg)
+            return
+
+        if is_new:
+            self._new_devices[device_name] = sensors
+        if self._pending_messages is None:
+            self._pending_messages = []
+            self._cancel_add_new_sensors = async_call_later(
+                self.hass, _NEW_DEVICES_DELAY, self._add_new_sensors
+            )
+        # keep messages order until sensors of new devices are added
+        self._pending_messages.append((device_name, sensors, msg))
+
+    async def _add_new_sensors(self, _now) -> None:
+        """Add sensors of new devices in one batch and process pending messages."""
+        self._cancel_add_new_sensors = None
+        failed_devices: set[str] = set()
+        try:
+            # more devices could appear while previous batch is being added
+            while self._new_devices:
+                new_devices, self._new_devices = self._new_devices, {}
+                try:
+                    await self._platform.async_add_entities(
+                        [s for sensors in new_devices.values() for s in sensors], True
+                    )
+                except Exception:  # pylint: disable=broad-except
+                    _LOGGER.exception(
+                        "Could not add sensors for %s", ", ".join(new_devices)
+                    )
+                    # forget devices, so sensors are created again with next message
+                    for device in new_devices:
+                        self.__sensors.pop(device, None)
+                    failed_devices.update(new_devices)
+        finally:
+            messages, self._pending_messages = self._pending_messages or [], None
+            for device, sensors, msg in messages:
+                if device not in failed_devices:
+                    self._process_message(sensors, msg)
+
+    def get_sensors(
+        self, device
+    ) -> Tuple[Tuple[SleepAsAndroidSensor, ...], bool]:
         """Get sensor by it's name."""
-        is_new = False
-        if not device in self.__sensors:
-            self.__sensors[device] = []
-            self.__sensors[device].append(SleepAsAndroidLastEvent(device))
-            self.__sensors[device].append(SleepAsAndroidIsAsleep(device))
-            is_new = True
-        return self.__sensors[device], is_new
+        try:
+            return self.__sensors[device], False
+        except KeyError:
+            sensors = (SleepAsAndroidLastEvent(device), SleepAsAndroidIsAsleep(device))
+            self.__sensors[device] = sensors
+            return sensors, True
 
     async def _get_version(self) -> None:
         ha_version = HaVersion()
         await ha_version.get_version()
-        ha_version_cleaned = re.sub(r"[ab][0-9]+$", "", ha_version.version)
-        self._ha_version = AwesomeVersion(ha_version_cleaned)
-
-    def remove_sensor(self, sensor_name: str) -> SleepAsAndroidSensor | None:
+        # pre-release suffixes (b0, dev...) are ignored
+        m = _VERSION_RE.match(ha_version.version)
+        if m is None:
+            _LOGGER.warning(
+                "Could not parse Home Assistant version '%s'. Will use MQTT API of 2022.3.0 and newer",
+                ha_version.version,
+            )
+            self._ha_version = None
+            self._use_new_api = True
+            return
+        self._ha_version = tuple(int(x) for x in m.groups())
+        self._use_new_api = self._ha_version >= _MQTT_API_2022_03
+
+    def remove_sensor(
+        self, sensor_name: str
+    ) -> Tuple[SleepAsAndroidSensor, ...] | None:
         """Remove sensor from internal list."""
         # cut prefix to convert device name to sensor name. create_entity_id have created it for us
         sensor_name = (
@@ -302,6 +401,6 @@ class SleepAsAndroidInstance:
         )
 
         _LOGGER.debug(
-            f"Removing sensor {sensor_name} from internal list {self.__sensors}"
+            "Removing sensor %s from internal list %s", sensor_name, self.__sensors
         )
         return self.__sensors.pop(sensor_name, None)
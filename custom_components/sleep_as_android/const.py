@@ -43,3 +43,4 @@ class SleepTrackingEvent(enum.Enum):
 
 
 sleep_tracking_events = [e.value for e in SleepTrackingEvent]
+EVENT_BY_VALUE: dict[str, SleepTrackingEvent] = {e.value: e for e in SleepTrackingEvent}
@@ -19,11 +19,25 @@ from .const import DOMAIN, sleep_tracking_events
 
 _LOGGER = logging.getLogger(__name__)
 
+# Ordered list for UI and blueprint generator, set for validation
 TRIGGERS = sleep_tracking_events + [STATE_UNKNOWN]
+_TRIGGERS_SET = frozenset(TRIGGERS)
+
+# Triggers without device_id, which is the only field that differs between devices
+_TRIGGER_PROTOS = tuple(
+    {
+        # Required fields of TRIGGER_BASE_SCHEMA
+        CONF_PLATFORM: "device",
+        CONF_DOMAIN: DOMAIN,
+        # Required fields of TRIGGER_SCHEMA
+        CONF_TYPE: t,
+    }
+    for t in TRIGGERS
+)
 
 TRIGGER_SCHEMA = HA_TRIGGER_BASE_SCHEMA.extend(
     {
-        vol.Required(CONF_TYPE): vol.In(TRIGGERS),
+        vol.Required(CONF_TYPE): vol.In(_TRIGGERS_SET),
     }
 )
 
@@ -31,21 +45,7 @@ TRIGGER_SCHEMA = HA_TRIGGER_BASE_SCHEMA.extend(
 async def async_get_triggers(hass, device_id):
     """Return a list of triggers."""
 
-    triggers = []
-
-    for t in TRIGGERS:
-        triggers.append(
-            {
-                # Required fields of TRIGGER_BASE_SCHEMA
-                CONF_PLATFORM: "device",
-                CONF_DOMAIN: DOMAIN,
-                CONF_DEVICE_ID: device_id,
-                # Required fields of TRIGGER_SCHEMA
-                CONF_TYPE: t,
-            }
-        )
-
-    return triggers
+    return [{**p, CONF_DEVICE_ID: device_id} for p in _TRIGGER_PROTOS]
 
 
 async def async_attach_trigger(hass: HomeAssistant, config, action, automation_info):
@@ -1,10 +1,9 @@
 """Sensor for Sleep as android states."""
 
 import abc
-import enum
-import json
 import logging
-from typing import TYPE_CHECKING, Any, Dict
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, List, Mapping, Optional, Tuple
 
 from homeassistant.components import mqtt 
 from homeassistant.components.sensor import RestoreSensor, SensorDeviceClass
@@ -12,13 +11,37 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import STATE_UNKNOWN
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers import entity_registry, entity_platform, device_registry
-from .const import DOMAIN, SleepTrackingEvent
+import orjson
+
+from .const import DOMAIN, EVENT_BY_VALUE, SleepTrackingEvent
 
 if TYPE_CHECKING:
     from . import SleepAsAndroidInstance
 
 _LOGGER = logging.getLogger(__name__)
 
+
+def _options(mapping: Mapping[SleepTrackingEvent, str]) -> List[str]:
+    """Possible sensor states for mapping: STATE_UNKNOWN and unique mapped values."""
+    return list(dict.fromkeys((STATE_UNKNOWN, *mapping.values())))
+
+
+_LAST_EVENT_MAPPING: Mapping[SleepTrackingEvent, str] = MappingProxyType(
+    {e: e.value for e in SleepTrackingEvent}
+)
+_LAST_EVENT_OPTIONS = _options(_LAST_EVENT_MAPPING)
+
+_IS_ASLEEP_MAPPING: Mapping[SleepTrackingEvent, str] = MappingProxyType(
+    {
+        SleepTrackingEvent.AWAKE: 'awake',
+        SleepTrackingEvent.NOT_AWAKE: 'sleeping',
+        SleepTrackingEvent.SLEEP_TRACKING_STOPPED: STATE_UNKNOWN,
+        SleepTrackingEvent.SLEEP_TRACKING_PAUSED: STATE_UNKNOWN,
+    }
+)
+_IS_ASLEEP_OPTIONS = _options(_IS_ASLEEP_MAPPING)
+
+
 async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, async_add_entities: entity_platform.AddEntitiesCallback):
     instance: SleepAsAndroidInstance = hass.data[DOMAIN][config_entry.entry_id]
     entities = entity_registry.async_entries_for_config_entry(
@@ -27,9 +50,11 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, asyn
 
     dr = device_registry.async_get(hass)
     sensors = []
-    for entity in entities:
-        device_name = dr.async_get(entity.device_id).name
-        s, is_new = instance.get_sensors(device_name)
+    # every device has several entities, so look up each device only once
+    for device_id in {entity.device_id for entity in entities}:
+        if device_id is None or (device := dr.async_get(device_id)) is None:
+            continue
+        s, is_new = instance.get_sensors(device.name)
         if is_new:
             sensors.extend(s)
     async_add_entities(sensors)
@@ -38,6 +63,46 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, asyn
     return True
 
 
+def _payload_text(payload: bytes | str) -> str:
+    """Payload as text for log messages."""
+    if isinstance(payload, bytes):
+        return payload.decode("utf-8", errors="replace")
+    return payload
+
+
+def decode_message(
+    msg: mqtt.models.ReceiveMessage,
+) -> Optional[Tuple[SleepTrackingEvent, Dict[str, str]]]:
+    """Decode MQTT message once for all sensors of the device.
+
+    :param msg: MQTT message
+    :returns: event and rest of payload values or None if there is nothing to process
+    """
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug("Processing message %s", msg)
+    try:
+        payload = orjson.loads(msg.payload)
+    except orjson.JSONDecodeError:
+        _LOGGER.warning(
+            "expected JSON payload. got '%s' instead", _payload_text(msg.payload)
+        )
+        return None
+    # See https://docs.sleep.urbandroid.org/services/mqtt.html#format-of-the-post-request
+    if 'event' not in payload:
+        _LOGGER.warning("Got unexpected payload: '%s'", payload)
+        return None
+    event = payload.pop('event')
+    if (tracking_event := EVENT_BY_VALUE.get(event)) is not None:
+        return tracking_event, payload
+    if event == 'Unknown':
+        _LOGGER.warning(
+            "Successfuly got testing message: '%s'", _payload_text(msg.payload)
+        )
+    else:
+        _LOGGER.warning("Got unknown event '%s'", event)
+    return None
+
+
 class SleepAsAndroidSensor(abc.ABC, RestoreSensor):
     """Sensor for the integration."""
     _attr_should_poll = False
@@ -48,6 +113,12 @@ class SleepAsAndroidSensor(abc.ABC, RestoreSensor):
         self._device = device
         self._name: str = name
         self._attr_name = name
+        self._attr_unique_id = f"{device}_{name}"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, device)},
+            "connections": set(),
+            "name": device,
+        }
 
     async def async_added_to_hass(self):
         """Restore any data that already exists """
@@ -56,80 +127,49 @@ class SleepAsAndroidSensor(abc.ABC, RestoreSensor):
             self._attr_native_value = old_state.native_value
             self.async_write_ha_state()
 
-    def process_message(self, msg: mqtt.models.ReceiveMessage):
-        """Process new MQTT messages."""
-        _LOGGER.debug(f"Processing message {msg}")
-        try:
-            payload = json.loads(msg.payload)
-        except json.decoder.JSONDecodeError:
-            _LOGGER.warning("expected JSON payload. got '%s' instead", msg.payload)
-            return
-        # See https://docs.sleep.urbandroid.org/services/mqtt.html#format-of-the-post-request
-        if 'event' not in payload:
-            _LOGGER.warning("Got unexpected payload: '%s'", payload)
-            return
-        event = payload.pop('event')
-        if event == 'Unknown':
-            _LOGGER.warning("Successfuly got testing message: '%s'", msg.payload)
-        else:
-            self._process_message(SleepTrackingEvent(event), payload)
+    def process_message(self, event: SleepTrackingEvent, values: Dict[str, str]):
+        """Process event decoded from MQTT message by decode_message."""
+        self._process_message(event, values)
 
     @abc.abstractmethod
     def _process_message(self, event: SleepTrackingEvent, values: Dict[str, str]):
         """Process new MQTT messages."""
         pass
 
-    @property
-    def unique_id(self) -> str:
-        """Return a unique ID."""
-        return f"{self._device}_{self._name}"
-
-    @property
-    def device_info(self):
-        """Device info for sensor."""
-        return {
-            "identifiers": {(DOMAIN, self._device)},
-            "connections": set(),
-            "name": self._device
-            }
-
 
 class SleepAsAndroidState(SleepAsAndroidSensor):
     _attr_device_class = SensorDeviceClass.ENUM
 
-    def __init__(self, device: str, name: str, icon: str, mapping: Dict[SleepTrackingEvent, str]):
+    def __init__(self, device: str, name: str, icon: str, mapping: Mapping[SleepTrackingEvent, str], options: List[str]):
         super().__init__(device, name)
         self._attr_native_value: str = STATE_UNKNOWN
         self._attr_icon = icon
-        self._attr_options = [
-            STATE_UNKNOWN,
-            *mapping.values()
-        ]
+        self._attr_options = options
         self._mapping = mapping
 
     def _process_message(self, event: SleepTrackingEvent, _values):
-        if event in self._mapping:
-            self._attr_native_value = self._mapping[event]
+        state = self._mapping.get(event)
+        if state is not None and state != self._attr_native_value:
+            self._attr_native_value = state
             self.async_write_ha_state()
 
 
 class SleepAsAndroidLastEvent(SleepAsAndroidState):
     """Last event received from Sleep as Android."""
     def __init__(self, device: str):
-        mapping = {e: e.value for e in SleepTrackingEvent}
-        super().__init__(device, "last_event", "mdi:arrow-right-thick", mapping)
+        super().__init__(device, "last_event", "mdi:arrow-right-thick", _LAST_EVENT_MAPPING, _LAST_EVENT_OPTIONS)
 
     def _process_message(self, event: SleepTrackingEvent, values: Dict[str, str]):
-        self._attr_extra_state_attributes = values
-        super()._process_message(event, values)
+        state = self._mapping[event]
+        if (
+            state != self._attr_native_value
+            or values != getattr(self, "_attr_extra_state_attributes", None)
+        ):
+            self._attr_native_value = state
+            self._attr_extra_state_attributes = values
+            self.async_write_ha_state()
 
 
 class SleepAsAndroidIsAsleep(SleepAsAndroidState):
     def __init__(self, device: str):
-        mapping = {
-            SleepTrackingEvent.AWAKE: 'awake',
-            SleepTrackingEvent.NOT_AWAKE: 'sleeping',
-            SleepTrackingEvent.SLEEP_TRACKING_STOPPED: STATE_UNKNOWN,
-            SleepTrackingEvent.SLEEP_TRACKING_PAUSED: STATE_UNKNOWN,
-        }
-        super().__init__(device, "is_asleep", "mdi:sleep", mapping)
\ No newline at end of file
+        super().__init__(device, "is_asleep", "mdi:sleep", _IS_ASLEEP_MAPPING, _IS_ASLEEP_OPTIONS)
\ No newline at end of file
@@ -1,7 +1,6 @@
 """Tests for instance component."""
 
-import unittest.mock as mock
-from unittest.mock import MagicMock, PropertyMock, patch
+from unittest.mock import AsyncMock, MagicMock, PropertyMock, call, patch
 import uuid
 
 from homeassistant.helpers import entity_registry
@@ -26,6 +25,14 @@ class TestingSleepAsAndroidInstance(SleepAsAndroidInstance):
         pass
 
 
+def _config_entry(options=None, data=None):
+    """Create config entry with given options and data."""
+    entry = MagicMock()
+    entry.options = options if options is not None else {}
+    entry.data = data if data is not None else {}
+    return entry
+
+
 class TestSleepAsAndroidInstance:
     """Tests for instance."""
 
@@ -33,6 +40,7 @@ class TestSleepAsAndroidInstance:
         "t, position, expect",
         [
             ("test", 1, "test"),
+            ("foo/bar/baz/moo", 0, "foo"),
             ("foo/bar/baz/moo", 2, "baz"),
             ("foo/bar/baz/moo", 8, "moo"),
         ],
@@ -46,46 +54,30 @@ class TestSleepAsAndroidInstance:
 
     def test_device_position_in_topic(self):
         """Check for determination device name position in topic."""
-        with patch(
-            __name__ + ".TestingSleepAsAndroidInstance.configured_topic",
-            new_callable=mock.PropertyMock,
-        ) as mock_configured_topic:
-            mock_configured_topic.return_value = "SleepAsAndroid/%%%device%%%"
-            instance = TestingSleepAsAndroidInstance(
-                hass=None, config_entry=None, registry=None
-            )
-            assert instance.device_position_in_topic == 1
+        instance = SleepAsAndroidInstance(
+            hass=hass,
+            config_entry=_config_entry(
+                options={"topic_template": "SleepAsAndroid/%%%device%%%"}
+            ),
+        )
+        assert instance.device_position_in_topic == 1
 
     @pytest.mark.parametrize(
         "template, position, expect",
         [
             ("foo/bar", 2, "foo/bar"),
+            ("%%%device%%%", 0, "+"),
             ("baz/%%%device%%%", 1, "baz/+"),
             ("foo/%%%device%%%/bar", 1, "foo/+/bar"),
             ("foo/%%%device%%%baz/bar", 3, "foo/%%%device%%%baz/bar"),
         ],
     )
-    @patch(
-        __name__ + ".SleepAsAndroidInstance.configured_topic", new_callable=PropertyMock
-    )
-    @patch(
-        __name__ + ".SleepAsAndroidInstance.device_position_in_topic",
-        new_callable=PropertyMock,
-    )
-    def test_topic_template(
-        self,
-        mocked_device_position_in_topic,
-        mocked_configured_topic,
-        template,
-        position,
-        expect,
-    ):
+    def test_topic_template(self, template, position, expect):
         """Test for topic templating."""
-        mocked_device_position_in_topic.return_value = position
-        mocked_configured_topic.return_value = template
         instance = SleepAsAndroidInstance(
-            hass=hass, config_entry=config_entry, registry=None
+            hass=hass, config_entry=_config_entry(options={"topic_template": template})
         )
+        assert instance.device_position_in_topic == position
         assert instance.topic_template == expect
 
     def test_name(self):
@@ -95,45 +87,35 @@ class TestSleepAsAndroidInstance:
         type(config_entry).options = PropertyMock(
             return_value={
                 "name": name,
-                "topic_template": uuid.uuid4(),
+                "topic_template": str(uuid.uuid4()),
             }
         )
-        instance = SleepAsAndroidInstance(
-            hass=hass, config_entry=config_entry, registry=None
-        )
+        instance = SleepAsAndroidInstance(hass=hass, config_entry=config_entry)
         assert instance.name == name
 
         #  check default name
         type(config_entry).options = PropertyMock(return_value={})
         type(config_entry).data = PropertyMock(return_value={})
 
-        instance = SleepAsAndroidInstance(
-            hass=hass, config_entry=config_entry, registry=None
-        )
+        instance = SleepAsAndroidInstance(hass=hass, config_entry=config_entry)
         assert instance.name == "SleepAsAndroid"
 
     @pytest.mark.parametrize(
-        "t, position, expect",
+        "template, t, expect",
         [
-            ("test", 1, "test"),
-            ("foo/bar/baz/moo", 2, "baz"),
-            ("foo/bar/baz/moo", 8, "moo"),
+            ("%%%device%%%", "test", "test"),
+            ("SleepAsAndroid/%%%device%%%", "SleepAsAndroid/test", "test"),
+            ("foo/bar/%%%device%%%/moo", "foo/bar/baz/moo", "baz"),
+            ("+/%%%device%%%", "home/igor", "igor"),
+            ("home/+/%%%device%%%/moo", "home/bedroom/igor/moo", "igor"),
+            ("foo/bar/baz/moo", "foo/bar/baz/moo", "moo"),
         ],
     )
-    @patch(
-        __name__ + ".SleepAsAndroidInstance.device_position_in_topic",
-        new_callable=PropertyMock,
-    )
-    def test_device_name_from_topic(
-        self,
-        mocked_device_position_in_topic,
-        t,
-        position,
-        expect,
-    ):
+    def test_device_name_from_topic(self, template, t, expect):
         """Test for getting device name from topic."""
-        instance = TestingSleepAsAndroidInstance(None, None, None)
-        mocked_device_position_in_topic.return_value = position
+        instance = SleepAsAndroidInstance(
+            hass=hass, config_entry=_config_entry(options={"topic_template": template})
+        )
         assert instance.device_name_from_topic(t) == expect
 
     @pytest.mark.parametrize(
@@ -143,22 +125,16 @@ class TestSleepAsAndroidInstance:
             "foo/bar",
         ],
     )
-    @patch(__name__ + ".SleepAsAndroidInstance.get_from_config")
-    def test_configured_topic(self, mocked_get_from_config, v):
+    def test_configured_topic(self, v):
         """Check configured topic."""
-        instance = TestingSleepAsAndroidInstance(None, None, None)
-        mocked_get_from_config.return_value = v
+        instance = SleepAsAndroidInstance(
+            hass=hass, config_entry=_config_entry(data={"topic_template": v})
+        )
         assert instance.configured_topic == v
 
-    @patch(__name__ + ".SleepAsAndroidInstance.get_from_config")
-    def test_with_exception(self, mocked_get_from_config):
+    def test_with_exception(self):
         """Check default topic with exception."""
-
-        def side_effect(_arg):
-            raise KeyError
-
-        instance = TestingSleepAsAndroidInstance(None, None, None)
-        mocked_get_from_config.side_effect = side_effect
+        instance = SleepAsAndroidInstance(hass=hass, config_entry=_config_entry())
         assert instance.configured_topic == "SleepAsAndroid/" + DEVICE_MACRO
 
     @pytest.mark.parametrize(
@@ -226,3 +202,126 @@ class TestAsyncSleepAsAndroidInstance:
             is True
         )
         assert ret is True
+
+
+def _batching_instance():
+    """Create instance with mocked platform."""
+    instance = SleepAsAndroidInstance(
+        hass=hass,
+        config_entry=_config_entry(
+            options={"topic_template": "SleepAsAndroid/%%%device%%%"}
+        ),
+    )
+    instance._platform = MagicMock()
+    instance._platform.async_add_entities = AsyncMock()
+    return instance
+
+
+def _message(device):
+    """Create MQTT message for device."""
+    return MagicMock(topic=f"SleepAsAndroid/{device}", payload=b"{}")
+
+
+@patch(__name__ + ".SleepAsAndroidInstance._process_message")
+@patch("custom_components.sleep_as_android.async_call_later")
+class TestNewSensorsBatching:
+    """Tests for adding sensors of new devices in batches."""
+
+    async def test_coalescing_window(self, mocked_call_later, mocked_process):
+        """Sensors of devices from one window are added at once."""
+        instance = _batching_instance()
+        msg_foo, msg_bar = _message("foo"), _message("bar")
+
+        instance.message_received(msg_foo)
+        instance.message_received(msg_bar)
+
+        mocked_call_later.assert_called_once_with(
+            hass,
+            custom_components.sleep_as_android._NEW_DEVICES_DELAY,
+            instance._add_new_sensors,
+        )
+        mocked_process.assert_not_called()
+        instance._platform.async_add_entities.assert_not_called()
+
+        await instance._add_new_sensors(None)
+
+        foo, _ = instance.get_sensors("foo")
+        bar, _ = instance.get_sensors("bar")
+        instance._platform.async_add_entities.assert_awaited_once_with(
+            [*foo, *bar], True
+        )
+        assert mocked_process.call_args_list == [call(foo, msg_foo), call(bar, msg_bar)]
+
+    async def test_known_device(self, mocked_call_later, mocked_process):
+        """Messages of known devices are processed at once if nothing is pending."""
+        instance = _batching_instance()
+        sensors, _ = instance.get_sensors("foo")
+        msg = _message("foo")
+
+        instance.message_received(msg)
+
+        mocked_call_later.assert_not_called()
+        mocked_process.assert_called_once_with(sensors, msg)
+
+    async def test_known_device_order(self, mocked_call_later, mocked_process):
+        """Messages of known devices wait for pending batch to keep order."""
+        instance = _batching_instance()
+        foo, _ = instance.get_sensors("foo")
+        msg_bar, msg_foo = _message("bar"), _message("foo")
+
+        instance.message_received(msg_bar)
+        instance.message_received(msg_foo)
+        mocked_process.assert_not_called()
+
+        await instance._add_new_sensors(None)
+
+        bar, _ = instance.get_sensors("bar")
+        assert mocked_process.call_args_list == [call(bar, msg_bar), call(foo, msg_foo)]
+
+    async def test_new_device_while_adding(self, mocked_call_later, mocked_process):
+        """Device that appears while batch is being added is added in the same flush."""
+        instance = _batching_instance()
+        msg_foo, msg_bar = _message("foo"), _message("bar")
+
+        async def add_entities(_entities, _update):
+            if instance._platform.async_add_entities.await_count == 1:
+                instance.message_received(msg_bar)
+
+        instance._platform.async_add_entities.side_effect = add_entities
+        instance.message_received(msg_foo)
+        await instance._add_new_sensors(None)
+
+        foo, _ = instance.get_sensors("foo")
+        bar, _ = instance.get_sensors("bar")
+        assert instance._platform.async_add_entities.await_args_list == [
+            call([*foo], True),
+            call([*bar], True),
+        ]
+        mocked_call_later.assert_called_once()
+        assert mocked_process.call_args_list == [call(foo, msg_foo), call(bar, msg_bar)]
+        assert instance._pending_messages is None
+
+    async def test_failed_add(self, mocked_call_later, mocked_process):
+        """Failed devices are forgotten and messages are not stuck in queue."""
+        instance = _batching_instance()
+        instance._platform.async_add_entities.side_effect = RuntimeError
+        instance.message_received(_message("foo"))
+
+        await instance._add_new_sensors(None)
+
+        mocked_process.assert_not_called()
+        assert instance._pending_messages is None
+
+        # device is created and scheduled again with next message
+        instance.message_received(_message("foo"))
+        assert mocked_call_later.call_count == 2
+
+    async def test_unsubscribe_cancels(self, mocked_call_later, mocked_process):
+        """Pending batch is cancelled on unsubscribe."""
+        instance = _batching_instance()
+        instance.message_received(_message("foo"))
+
+        await instance.unsubscribe()
+
+        mocked_call_later.return_value.assert_called_once_with()
+        assert instance._cancel_add_new_sensors is None
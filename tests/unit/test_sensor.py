@@ -0,0 +1,105 @@
+"""Tests for sensor component."""
+
+import logging
+from unittest.mock import MagicMock
+
+import pytest
+
+from custom_components.sleep_as_android.const import SleepTrackingEvent
+from custom_components.sleep_as_android.sensor import (
+    SleepAsAndroidIsAsleep,
+    SleepAsAndroidLastEvent,
+    decode_message,
+)
+
+
+def _message(payload):
+    """Create MQTT message with payload."""
+    return MagicMock(topic="SleepAsAndroid/foo", payload=payload)
+
+
+def _sensor(cls):
+    """Create sensor with mocked state writing."""
+    sensor = cls("foo")
+    sensor.async_write_ha_state = MagicMock()
+    return sensor
+
+
+class TestDecodeMessage:
+    """Tests for MQTT message decoding."""
+
+    @pytest.mark.parametrize(
+        "payload",
+        [
+            b'{"event": "awake", "value1": "1"}',
+            '{"event": "awake", "value1": "1"}',
+        ],
+    )
+    def test_event(self, payload):
+        """Known event is decoded with the rest of payload."""
+        assert decode_message(_message(payload)) == (
+            SleepTrackingEvent.AWAKE,
+            {"value1": "1"},
+        )
+
+    @pytest.mark.parametrize(
+        "payload, log",
+        [
+            (b"not json", "expected JSON payload. got 'not json' instead"),
+            (b'{"value1": "1"}', "Got unexpected payload"),
+            (
+                b'{"event": "Unknown"}',
+                """Successfuly got testing message: '{"event": "Unknown"}'""",
+            ),
+            (b'{"event": "foo"}', "Got unknown event 'foo'"),
+        ],
+    )
+    def test_nothing_to_process(self, caplog, payload, log):
+        """Messages without known event are logged once and not dispatched."""
+        with caplog.at_level(logging.WARNING):
+            assert decode_message(_message(payload)) is None
+
+        assert len(caplog.records) == 1
+        assert log in caplog.text
+
+
+class TestProcessMessage:
+    """Tests for writing sensor states."""
+
+    def test_state_not_changed(self):
+        """State is written only when mapped value changes."""
+        sensor = _sensor(SleepAsAndroidIsAsleep)
+
+        sensor.process_message(SleepTrackingEvent.AWAKE, {})
+        sensor.process_message(SleepTrackingEvent.AWAKE, {})
+        assert sensor.native_value == "awake"
+        sensor.async_write_ha_state.assert_called_once()
+
+        sensor.process_message(SleepTrackingEvent.NOT_AWAKE, {})
+        assert sensor.native_value == "sleeping"
+        assert sensor.async_write_ha_state.call_count == 2
+
+    def test_state_not_mapped(self):
+        """Events without mapping do not change state."""
+        sensor = _sensor(SleepAsAndroidIsAsleep)
+
+        sensor.process_message(SleepTrackingEvent.REM, {})
+        sensor.async_write_ha_state.assert_not_called()
+
+    def test_last_event_same_values(self):
+        """Repeated event with the same values is not written again."""
+        sensor = _sensor(SleepAsAndroidLastEvent)
+
+        sensor.process_message(SleepTrackingEvent.REM, {"value1": "1"})
+        sensor.process_message(SleepTrackingEvent.REM, {"value1": "1"})
+        assert sensor.native_value == "rem"
+        sensor.async_write_ha_state.assert_called_once()
+
+    def test_last_event_different_values(self):
+        """Repeated event with new values is written."""
+        sensor = _sensor(SleepAsAndroidLastEvent)
+
+        sensor.process_message(SleepTrackingEvent.REM, {"value1": "1"})
+        sensor.process_message(SleepTrackingEvent.REM, {"value1": "2"})
+        assert sensor.extra_state_attributes == {"value1": "2"}
+        assert sensor.async_write_ha_state.call_count == 2